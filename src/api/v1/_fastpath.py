@@ -0,0 +1,107 @@
+"""
+Per-request conversion of a part into the KiCad part-detail shape.
+
+Kept free of FastAPI/SQLAlchemy imports so the conversion can be used and tested on its own.
+`part` is typed Any because it is either a Part or a SQLAlchemy Row of main.PART_DETAIL_COLUMNS.
+"""
+import json
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any
+
+@dataclass
+class CommonFieldSpec:
+    """Dataclass to hold info about fields that KiCad always wants (including the visibility)"""
+    name: str
+    visible: bool = False
+
+# These are fields that KiCad always needs. As such, they are fixed in the database schema. I don't want collisions with the json fields.
+# If you want to add more fields, add them to the `fields` JSONB column.
+# Note that KiCad will show all fields by default unless you set "visible" to "False" in the field dict.
+# Example: fields = {"footprint": {"value": "Resistor_SMD:R_0805_2012Metric", "visible": "False"}, "my_custom_field": {"value": "foo", "visible": "True"}}
+FIXED_FIELDS: list[CommonFieldSpec] = [
+    CommonFieldSpec("footprint", False),
+    CommonFieldSpec("datasheet", False),
+    CommonFieldSpec("value", True),
+    CommonFieldSpec("reference", True),
+    CommonFieldSpec("description", False),
+    CommonFieldSpec("keywords", False),
+]
+
+FIXED_FIELD_NAMES = frozenset(f.name.lower() for f in FIXED_FIELDS)
+
+# (name, KiCad visibility string) pairs, resolved once instead of on every request
+_FIXED_FIELD_VISIBILITY: tuple[tuple[str, str], ...] = tuple(
+    (f.name, "True" if f.visible else "False") for f in FIXED_FIELDS
+)
+
+_TRUE_STRINGS = frozenset(("1", "true", "yes", "y"))
+
+def to_bool_str(x: object) -> str:
+    """KiCad wants string booleans: map bools, numbers and truthy strings to "True"/"False"."""
+    if x is True or x == "True":
+        return "True"
+    if x is False or x == "False":
+        return "False"
+    if isinstance(x, str):
+        return "True" if x.lower() in _TRUE_STRINGS else "False"
+    if isinstance(x, (int, float)):
+        return "True" if x else "False"
+    return "False"
+
+def value_str(v: object) -> str:
+    """
+    Stringify a custom field's "value" the same way parts_kicad_payload() in src/db.py does.
+    Floats are written positionally (1e-06 -> "0.000001"), which is how Postgres prints a jsonb number,
+    and lists/dicts become JSON text with jsonb's ", "/": " separators.
+    """
+    if type(v) is str:
+        return v
+    if v is None:
+        return ""
+    if v is True:
+        return "True"
+    if v is False:
+        return "False"
+    if isinstance(v, float):
+        return format(Decimal(repr(v)), "f")
+    if isinstance(v, (dict, list)):
+        return json.dumps(v, ensure_ascii=False)
+    return str(v)
+
+def part_to_kicad_fields(part: Any) -> dict[str, Any]:
+    """
+    Convert a Part instance (or a row of main.PART_DETAIL_COLUMNS) to the dict format KiCad expects for part details.
+    This includes converting all values to strings, and ensuring certain fields are always present.
+    This is a separate function to allow easier unit testing.
+    """                     
+    fields: dict[str, dict[str, str]] = {}
+
+    # these are fields that KiCad always wants
+    for name, visible in _FIXED_FIELD_VISIBILITY:
+        val = getattr(part, name, "")
+        # these columns are almost always str already; only convert the odd None/non-str value
+        fields[name] = {"value": val if type(val) is str else ("" if val is None else str(val)), "visible": visible}
+
+    # NOT NULL in the schema, so an empty dict is the common "nothing custom" case
+    custom: dict[str, Any] | None = part.fields
+    if custom:
+        for k, v in custom.items():
+
+            # check to make sure we don't overwrite fixed fields
+            # This supports both {"field": "value"} and {"field": {"value": "x", "visible": "True"}}.
+            if k.lower() not in FIXED_FIELD_NAMES:
+                if isinstance(v, dict) and "value" in v:
+                    fields[k] = {"value": value_str(v["value"]), "visible": to_bool_str(v.get("visible", False))}
+                elif isinstance(v, str):
+                    fields[k] = {"value": v, "visible": "False"}
+
+    return {
+        "id": str(part.sequence_number),
+        "name": part.name or str(part.sequence_number),
+        "symbolIdStr": part.symbol_id,
+        "exclude_from_bom": to_bool_str(part.exclude_from_bom),
+        "exclude_from_board": to_bool_str(part.exclude_from_board),
+        "exclude_from_sim": to_bool_str(part.exclude_from_sim),
+        "fields": fields,                              # all strings inside
+    }
@@ -1,78 +1,74 @@
 # routes_kicad.py
-from fastapi import APIRouter, Depends, HTTPException, FastAPI
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncGenerator, AsyncIterable, Sequence
+import anyio
+import orjson
+from cachetools import TTLCache
+from fastapi import APIRouter, Depends, HTTPException, FastAPI, Query
+from fastapi.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
 from sqlmodel import SQLModel, Field, Session, select
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import ColumnElement, String, Text, case, cast, func, tuple_
+from sqlalchemy.orm import raiseload
 from src.definitions import Category, Part
-from src.db import get_session, engine
+from src.db import AsyncSessionLocal, get_session, engine
+from src.api.v1._fastpath import part_to_kicad_fields
 from dataclasses import dataclass
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # without statement caching every request pays the SQL compile cost again. Only the failure case is logged, at
+    # WARNING: nothing configures the root logger under uvicorn, and logging's last-resort handler prints WARNING+.
+    if not engine.dialect.supports_statement_cache:
+        logger.warning("SQL statement cache is not supported by the %s dialect; every query is recompiled",
+                       engine.dialect.name)
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 router = APIRouter(prefix="/kicad-api/v1")
 
-@dataclass
-class CommonFieldSpec:
-    """Dataclass to hold info about fields that KiCad always wants (including the visibility)"""
+# rows per cursor fetch / streamed chunk in parts_for_category
+STREAM_BATCH_ROWS = 500
+
+# Response rows for the listing endpoints. orjson serialises (slotted) dataclasses natively, so the
+# handlers encode them directly and skip both dict building and FastAPI's jsonable_encoder.
+@dataclass(slots=True)
+class CategoryOut:
+    id: str
     name: str
-    visible: bool = False
+
+@dataclass(slots=True)
+class PartSummary:
+    id: str
+    name: str
+    description: str
     
-# These are fields that KiCad always needs. As such, they are fixed in the database schema. I don't want collisions with the json fields.
-# If you want to add more fields, add them to the `fields` JSONB column.
-# Note that KiCad will show all fields by default unless you set "visible" to "False" in the field dict.
-# Example: fields = {"footprint": {"value": "Resistor_SMD:R_0805_2012Metric", "visible": "False"}, "my_custom_field": {"value": "foo", "visible": "True"}}
-FIXED_FIELDS: list[CommonFieldSpec] = [
-    CommonFieldSpec("footprint", False),
-    CommonFieldSpec("datasheet", False),
-    CommonFieldSpec("value", True),
-    CommonFieldSpec("reference", True),
-    CommonFieldSpec("description", False),
-    CommonFieldSpec("keywords", False),
-]
-
-FIXED_FIELD_NAMES = (f.name.lower() for f in FIXED_FIELDS)
-
-def part_to_kicad_fields(part: Part) -> dict[str, str | dict]:
-    """
-    Convert a Part instance to the dict format KiCad expects for part details.
-    This includes converting all values to strings, and ensuring certain fields are always present.
-    This is a separate function to allow easier unit testing.
-    """                     
-    # KiCad wants string booleans and a nested fields dict with {"value", "visible"}
-    def to_bool_str(x: str | bool | int) -> str:  # ensure strings only
-        if isinstance(x, str) and x.lower() in ("1", "true", "yes", "y"):
-            return "True"
-        elif isinstance(x, (bool, int)):
-            return str(x)
-        else:
-            return "False"
-
-    fields = {}
-
-    # these are fields that KiCad always wants
-    for item in FIXED_FIELDS:
-        val = getattr(part, item.name, "")
-        fields[item.name] = dict(value= "" if val is None else str(val), visible= to_bool_str(item.visible))
-
-    for k, v in (part.fields or {}).items():
-
-        # check to make sure we don't overwrite fixed fields
-        # This supports both {"field": "value"} and {"field": {"value": "x", "visible": "True"}}.
-        if k.lower() not in FIXED_FIELD_NAMES:
-            if isinstance(v, dict) and "value" in v:
-                visibility = v.get("visible", "False")
-                fields[k] = dict(value= "" if v["value"] is None else str(v["value"]), visible= to_bool_str(v.get("visible", False)))
-            elif isinstance(v, str):
-                fields[k] = {"value": v, "visible": "False"}
-
-    return {
-        "id": str(part.sequence_number),
-        "name": part.name or str(part.sequence_number),
-        "symbolIdStr": part.symbol_id,
-        "exclude_from_bom": to_bool_str(part.exclude_from_bom),
-        "exclude_from_board": to_bool_str(part.exclude_from_board),
-        "exclude_from_sim": to_bool_str(part.exclude_from_sim),
-        "fields": fields,                              # all strings inside
-    }
+# part_detail bodies keyed by part id: (updated_at they were built from, JSON bytes)
+_PART_DETAIL_CACHE: TTLCache[int, tuple[datetime, bytes]] = TTLCache(maxsize=4096, ttl=300)
+
+# Columns part_to_kicad_fields reads; part_detail selects only these instead of hydrating a full Part
+PART_DETAIL_COLUMNS = (
+    Part.sequence_number,
+    Part.name,
+    Part.symbol_id,
+    Part.value,
+    Part.reference,
+    Part.footprint,
+    Part.datasheet,
+    Part.description,
+    Part.keywords,
+    Part.fields,
+    # KiCad wants "True"/"False"; let Postgres produce the strings while it builds the row
+    case((Part.exclude_from_bom, "True"), else_="False").label("exclude_from_bom"),
+    case((Part.exclude_from_board, "True"), else_="False").label("exclude_from_board"),
+    case((Part.exclude_from_sim, "True"), else_="False").label("exclude_from_sim"),
+)
 
 @router.get("/")
 async def index():
@@ -87,33 +83,126 @@ async def list_categories(session: AsyncSession = Depends(get_session)):
         select(Category)
         .where(Category.is_active == True)
         .order_by(Category.display_name)
+        .options(raiseload(Category.parts))  # never lazy-load every part behind a category listing
     )
     rows = result.all()
-    return [{"id": str(r.id), "name": r.display_name} for r in rows]
+    return Response(orjson.dumps([CategoryOut(str(r.id), r.display_name) for r in rows]), media_type="application/json")
+
+def parts_listing_stmt(cid: int, limit: int | None = None, offset: int = 0, after_id: int | None = None):
+    """The parts_for_category query: active parts of a category as (id, name, description) strings."""
+    stmt = (
+        select(
+            cast(Part.sequence_number, String).label("id"),
+            func.coalesce(func.nullif(Part.name, ""), cast(Part.sequence_number, String)).label("name"),
+            func.coalesce(Part.description, "").label("description"),
+        )
+        .where(Part.category_id == cid, Part.is_active == True)
+        .order_by(Part.name, Part.sequence_number)
+    )
+    if after_id is not None:
+        # Names are not unique, so the keyset includes the tie-breaker column. The sort key is the stored name, which
+        # differs from the returned one for unnamed parts, so it is looked up from the id instead of coming from the
+        # client. An unknown id compares as NULL and yields an empty page.
+        after_name = select(Part.name).where(Part.sequence_number == after_id).scalar_subquery()
+        stmt = stmt.where(tuple_(Part.name, Part.sequence_number) > tuple_(after_name, after_id))
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    if offset:
+        stmt = stmt.offset(offset)
+    return stmt
 
 @router.get("/parts/category/{cid}.json")
-async def parts_for_category(cid: str, session: AsyncSession = Depends(get_session)):
-    """List all active parts in a given category ID. Return id, name, description."""
-    parts = await session.exec(
-        select(Part.sequence_number, Part.name, Part.description)
-        .where(Part.category_id == int(cid))
-        .order_by(Part.name)
-    )
-    return [
-        {"id": str(r[0]), "name": r[1] or r[0], "description": r[2] or ""} for r in parts
-    ]
+async def parts_for_category(
+    cid: int,
+    limit: int | None = Query(default=None, ge=1, le=5000),
+    offset: int = Query(default=0, ge=0),
+    after_id: int | None = Query(default=None, description="keyset pagination: id of the last part already received"),
+):
+    """
+    List all active parts in a given category ID. Return id, name, description.
+    KiCad fetches the whole category in one request, so paging is opt-in via limit/offset or the cheaper keyset
+    `after_id` (the id of the last part of the previous page).
+    The JSON array is streamed in batches straight from a server-side cursor, so memory stays flat for large categories.
+    """
+    stmt = parts_listing_stmt(cid, limit=limit, offset=offset, after_id=after_id)
+
+    # Run the query and fetch the first batch before committing to a 200, so database errors still become a 500.
+    # The response owns the session (a yield-dependency's session may already be closed while it streams) and
+    # closes it once it is done, releasing the connection and its cursor.
+    session = AsyncSessionLocal()
+    try:
+        result = await session.stream(stmt.execution_options(yield_per=STREAM_BATCH_ROWS))
+        partitions = result.partitions()
+        first = await anext(partitions, [])
+    except BaseException:
+        await session.close()
+        raise
+
+    async def batches() -> AsyncGenerator[list[PartSummary], None]:
+        yield [PartSummary(r.id, r.name, r.description) for r in first]
+        async for batch in partitions:
+            yield [PartSummary(r.id, r.name, r.description) for r in batch]
+
+    return SessionStreamingResponse(json_array_chunks(batches()), session, media_type="application/json")
+
+class SessionStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that closes `session` when the response finishes, however it ends. A finally block in the body
+    generator is not enough: if the client is gone before the first chunk is pulled, the generator never starts.
+    """
+    def __init__(self, content: AsyncIterable[bytes], session: AsyncSession, **kwargs: Any) -> None:
+        super().__init__(content, **kwargs)
+        self.session = session
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # shielded so a cancelled request still gives its connection back
+            with anyio.CancelScope(shield=True):
+                await self.session.close()
+
+async def json_array_chunks(batches: AsyncIterable[Sequence[Any]]) -> AsyncGenerator[bytes, None]:
+    """Encode batches of orjson-serialisable items as one JSON array, one chunk per non-empty batch."""
+    sep = b"["
+    async for batch in batches:
+        if batch:
+            yield sep + b",".join(orjson.dumps(item) for item in batch)
+            sep = b","
+    yield b"[]" if sep == b"[" else b"]"
 
 
 # --- 3) Part details: one object with symbolIdStr + fields map ---
 @router.get("/parts/{pid}.json")
-async def part_detail(pid: str, session: AsyncSession = Depends(get_session)):
+async def part_detail(pid: int, session: AsyncSession = Depends(get_session)):
     """Get detailed info for a given part ID."""
-    # Have a view that already joins your preferred MPN/SKU and strings everything
-    res = await session.exec(select(Part).where(Part.sequence_number == int(pid)))
-    row = res.one_or_none()
-    if not row:
+    # The trigger keeps the KiCad-shaped response in kicad_payload; pass its JSON text straight through.
+    # Cached bodies are revalidated against updated_at, which the parts_guard_and_touch trigger bumps on every write;
+    # on a cache hit the same round trip skips sending the payload back when updated_at still matches.
+    hit = _PART_DETAIL_CACHE.get(pid)
+    payload: ColumnElement[Any] = cast(Part.kicad_payload, Text)
+    if hit is not None:
+        payload = case((Part.updated_at == hit[0], None), else_=payload)
+    result = await session.exec(
+        select(Part.updated_at, payload.label("payload")).where(Part.sequence_number == pid)
+    )
+    found = result.one_or_none()
+    if found is None:
+        _PART_DETAIL_CACHE.pop(pid, None)
         raise HTTPException(status_code=404, detail="Unknown part")
-    return part_to_kicad_fields(row)
+    updated_at, stored = found
+    if hit is not None and updated_at == hit[0]:
+        return Response(content=hit[1], media_type="application/json")
+
+    if stored is None:
+        # no stored payload (database set up without the triggers): build it here. Nothing bumps updated_at
+        # on such databases, so the body could not be revalidated and is not cached.
+        detail = await session.exec(select(*PART_DETAIL_COLUMNS).where(Part.sequence_number == pid))
+        return Response(content=orjson.dumps(part_to_kicad_fields(detail.one())), media_type="application/json")
+
+    content = stored.encode()
+    _PART_DETAIL_CACHE[pid] = (updated_at, content)
+    return Response(content=content, media_type="application/json")
 
 
 # This must be done once all the endpoints are defined
@@ -1,12 +1,33 @@
 import os
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Sequence
 from sqlmodel import SQLModel
+from sqlalchemy import insert
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, async_sessionmaker
+from src.api.v1._fastpath import _FIXED_FIELD_VISIBILITY
 
 DB_DSN = os.getenv("DB_DSN", "postgresql+asyncpg://ecad:ecadpw@db:5432/ecad")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "40"))
 
-engine: AsyncEngine = create_async_engine(DB_DSN, future=True, echo=False)
+# LIFO keeps a small set of connections warm and lets idle ones age out; pre-ping drops dead ones quietly
+engine: AsyncEngine = create_async_engine(
+    DB_DSN,
+    future=True,
+    echo=False,
+    pool_use_lifo=True,
+    pool_pre_ping=True,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=1800,  # seconds; recycle before server/proxy idle timeouts kick in
+    pool_timeout=10,    # seconds to wait for a free connection before failing the request
+    query_cache_size=1200,  # compiled-statement cache; default 500
+    connect_args={
+        # per-connection cache of server-side prepared statements (SQLAlchemy's asyncpg adapter); default 100
+        "prepared_statement_cache_size": 1024,
+        "server_settings": {"application_name": "kicad-api"},
+    },
+)
 AsyncSessionLocal = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
@@ -16,7 +37,77 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         yield session
 
+
+async def bulk_insert(session: AsyncSession, model: type[SQLModel], rows: Sequence[dict[str, Any]]) -> None:
+    """
+    Insert many rows of `model` in one executemany instead of one `session.add()` per row.
+    Rows are plain dicts keyed by column name; SQLAlchemy batches them into multi-VALUES INSERTs.
+    The caller is responsible for committing.
+    """
+    if rows:
+        await session.exec(insert(model), params=rows)
+
+# Brings databases created before newer columns existed up to date; create_all only creates missing tables
+SCHEMA_UPGRADE_SQLS = [
+    "ALTER TABLE parts ADD COLUMN IF NOT EXISTS kicad_payload jsonb;",
+    # ORM inserts used to store the JSON literal null instead of SQL NULL
+    "UPDATE parts SET kicad_payload = NULL WHERE kicad_payload = 'null'::jsonb;",
+    "UPDATE parts SET fields = '{}'::jsonb WHERE fields IS NULL;",
+    "ALTER TABLE parts ALTER COLUMN fields SET NOT NULL;",
+    "CREATE INDEX IF NOT EXISTS ix_parts_category_name ON parts (category_id, name, sequence_number) WHERE is_active;",
+    "CREATE INDEX IF NOT EXISTS ix_categories_display_name ON categories (display_name) WHERE is_active;",
+]
+
+# The fixed KiCad fields, spliced into parts_kicad_payload() from the same table part_to_kicad_fields() uses
+_FIXED_FIELD_NAMES_SQL = ", ".join(f"'{name.lower()}'" for name, _ in _FIXED_FIELD_VISIBILITY)
+_FIXED_FIELDS_SQL = ",\n            ".join(
+    f"'{name}', jsonb_build_object('value', coalesce(p.{name}, ''), 'visible', '{visible}')"
+    for name, visible in _FIXED_FIELD_VISIBILITY
+)
+
 GUARD_TOUCH_SQLS = [
+    # SQL twin of part_to_kicad_fields() in src/api/v1/_fastpath.py
+    f"""
+    CREATE OR REPLACE FUNCTION parts_kicad_payload(p parts)
+    RETURNS jsonb LANGUAGE sql IMMUTABLE AS $$
+      SELECT jsonb_build_object(
+        'id', p.sequence_number::text,
+        'name', coalesce(nullif(p.name, ''), p.sequence_number::text),
+        'symbolIdStr', p.symbol_id,
+        'exclude_from_bom', CASE WHEN p.exclude_from_bom THEN 'True' ELSE 'False' END,
+        'exclude_from_board', CASE WHEN p.exclude_from_board THEN 'True' ELSE 'False' END,
+        'exclude_from_sim', CASE WHEN p.exclude_from_sim THEN 'True' ELSE 'False' END,
+        'fields',
+          coalesce((
+            SELECT jsonb_object_agg(
+              f.key,
+              CASE jsonb_typeof(f.value)
+                WHEN 'string' THEN jsonb_build_object('value', f.value #>> '{{}}', 'visible', 'False')
+                ELSE jsonb_build_object(
+                  -- value_str(): strings/numbers/arrays/objects as their jsonb text, booleans as True/False, null as ''
+                  'value', CASE jsonb_typeof(f.value -> 'value')
+                             WHEN 'boolean' THEN CASE WHEN (f.value -> 'value')::boolean THEN 'True' ELSE 'False' END
+                             WHEN 'null' THEN ''
+                             ELSE f.value ->> 'value'
+                           END,
+                  -- to_bool_str(): true, non-zero numbers and truthy strings are visible; anything else is not
+                  'visible', CASE jsonb_typeof(f.value -> 'visible')
+                               WHEN 'boolean' THEN CASE WHEN (f.value -> 'visible')::boolean THEN 'True' ELSE 'False' END
+                               WHEN 'number' THEN CASE WHEN (f.value -> 'visible')::numeric <> 0 THEN 'True' ELSE 'False' END
+                               WHEN 'string' THEN CASE WHEN lower(f.value ->> 'visible') IN ('1', 'true', 'yes', 'y')
+                                                       THEN 'True' ELSE 'False' END
+                               ELSE 'False'
+                             END)
+              END)
+            FROM jsonb_each(p.fields) AS f
+            WHERE lower(f.key) NOT IN ({_FIXED_FIELD_NAMES_SQL})
+              AND (jsonb_typeof(f.value) = 'string' OR (jsonb_typeof(f.value) = 'object' AND f.value ? 'value'))
+          ), '{{}}'::jsonb)
+          || jsonb_build_object(
+            {_FIXED_FIELDS_SQL})
+      );
+    $$;
+    """,
     """
     CREATE OR REPLACE FUNCTION parts_guard_and_touch()
     RETURNS trigger LANGUAGE plpgsql AS $$
@@ -25,15 +116,18 @@ GUARD_TOUCH_SQLS = [
         RAISE EXCEPTION 'parts.name is immutable once assigned';
       END IF;
       NEW.updated_at := now();
+      NEW.kicad_payload := parts_kicad_payload(NEW);
       RETURN NEW;
     END $$;
     """,
     "DROP TRIGGER IF EXISTS trg_parts_guard_touch ON parts;",
     """
     CREATE TRIGGER trg_parts_guard_touch
-    BEFORE UPDATE ON parts
+    BEFORE INSERT OR UPDATE ON parts
     FOR EACH ROW EXECUTE FUNCTION parts_guard_and_touch();
-    """
+    """,
+    # backfill rows written before the payload existed (the trigger recomputes it)
+    "UPDATE parts SET kicad_payload = NULL WHERE kicad_payload IS NULL OR kicad_payload = 'null'::jsonb;",
 ]
 
 async def init_db(install_triggers: bool = True) -> None:
@@ -41,6 +135,8 @@ async def init_db(install_triggers: bool = True) -> None:
     from src.definitions.parts import Category, Part  # noqa: F401
     async with engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
+        for s in SCHEMA_UPGRADE_SQLS:
+            await conn.exec_driver_sql(s)
         if install_triggers:
             for s in GUARD_TOUCH_SQLS:
                 await conn.exec_driver_sql(s)
@@ -1,11 +1,15 @@
 from typing import Optional, Dict, Any
 from datetime import datetime
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import Column, DateTime, text, UniqueConstraint
+from sqlalchemy import Column, DateTime, Index, text, UniqueConstraint
 from sqlalchemy.dialects.postgresql import JSONB
 
 class Category(SQLModel, table=True):
     __tablename__ = "categories"
+    __table_args__ = (
+        # list_categories: active categories ordered by display name
+        Index("ix_categories_display_name", "display_name", postgresql_where=text("is_active")),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     display_name: str = Field(description="human-friendly name, e.g. 'Resistors (Thick Film)'")
@@ -18,7 +22,10 @@ class Category(SQLModel, table=True):
 
 class Part(SQLModel, table=True):
     __tablename__ = "parts"
-    # (keep your other __table_args__ as needed)
+    __table_args__ = (
+        # parts_for_category: filter on category and ORDER BY (name, sequence_number) straight from the index
+        Index("ix_parts_category_name", "category_id", "name", "sequence_number", postgresql_where=text("is_active")),
+    )
 
     sequence_number: Optional[int] = Field(default=None, primary_key=True)
     name: str
@@ -38,10 +45,17 @@ class Part(SQLModel, table=True):
 
     fields: Dict[str, str | dict] = Field(
         default_factory=dict,
-        sa_column=Column(JSONB, server_default=text("'{}'::jsonb")),
+        sa_column=Column(JSONB, server_default=text("'{}'::jsonb"), nullable=False),
         description="additional custom fields as JSONB",
     )
 
+    kicad_payload: Optional[Dict[str, Any]] = Field(
+        default=None,
+        # none_as_null: store SQL NULL rather than the JSON literal null, so part_detail can tell "no payload yet"
+        sa_column=Column(JSONB(none_as_null=True), nullable=True),
+        description="KiCad part-detail response, maintained by the parts_guard_and_touch trigger",
+    )
+
     exclude_from_bom: bool = Field(default=False, nullable=False, description="exclude from BOM exports")
     exclude_from_board: bool = Field(default=False, nullable=False, description="exclude from board layout exports")
     exclude_from_sim: bool = Field(default=False, nullable=False, description="exclude from simulation exports")
@@ -0,0 +1,126 @@
+from src.api.v1._fastpath import part_to_kicad_fields
+from src.api.v1.main import PART_DETAIL_COLUMNS, _PART_DETAIL_CACHE, part_detail, parts_listing_stmt
+from src.db import GUARD_TOUCH_SQLS, SCHEMA_UPGRADE_SQLS, bulk_insert
+from src.definitions.parts import Category, Part
+from test_part_to_fields import ODD_CUSTOM_FIELDS, test_part
+import asyncio
+import os
+
+import orjson
+import pytest
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+pytestmark = pytest.mark.skipif(not os.getenv("TEST_DB_DSN"), reason="set TEST_DB_DSN to a scratch Postgres database to run")
+
+
+def run_in_scratch_db(test, install_triggers: bool = True) -> None:
+    """
+    Run `await test(session, category_id)` against a freshly set up schema (the same steps as init_db) inside a
+    transaction that is rolled back afterwards, so the scratch database is left as it was.
+    """
+    async def run() -> None:
+        engine = create_async_engine(os.environ["TEST_DB_DSN"])
+        try:
+            async with engine.connect() as conn:
+                trans = await conn.begin()
+                await conn.run_sync(SQLModel.metadata.create_all)
+                for s in (*SCHEMA_UPGRADE_SQLS, *(GUARD_TOUCH_SQLS if install_triggers else ())):
+                    await conn.exec_driver_sql(s)
+                cid = (await conn.execute(insert(Category).values(display_name="Capacitors").returning(Category.id))).scalar_one()
+                async with AsyncSession(bind=conn, join_transaction_mode="create_savepoint") as session:
+                    await test(session, cid)
+                await trans.rollback()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+def test_bulk_insert():
+    async def check(session: AsyncSession, cid: int) -> None:
+        rows = [
+            dict(name=f"R{i}", category_id=cid, symbol_id="Device:R", footprint="Resistor_SMD:R_0603_1608Metric",
+                 value=f"{i}k", fields={"Tolerance": "1%"})
+            for i in range(3)
+        ]
+        await bulk_insert(session, Part, rows)
+        await bulk_insert(session, Part, [])  # no-op
+
+        parts = (await session.exec(select(Part).where(Part.category_id == cid).order_by(Part.name))).all()
+        assert [p.name for p in parts] == ["R0", "R1", "R2"]
+        # the BEFORE INSERT trigger fires for executemany inserts too
+        assert parts[1].kicad_payload["fields"]["value"] == {"value": "1k", "visible": "True"}
+        assert parts[1].kicad_payload["fields"]["Tolerance"] == {"value": "1%", "visible": "False"}
+
+    run_in_scratch_db(check)
+
+def test_keyset_pages_cover_listing_once():
+    async def check(session: AsyncSession, cid: int) -> None:
+        # duplicate and empty names: the empty ones are listed under their id, but sort by the stored ''
+        names = ["C2", "", "C1", "C2", "", "C10", "C1"]
+        await bulk_insert(session, Part, [
+            dict(name=n, category_id=cid, symbol_id="Device:C", footprint="Capacitor_SMD:C_0603_1608Metric", value="1u")
+            for n in names
+        ])
+
+        listing = (await session.exec(parts_listing_stmt(cid))).all()
+        assert len(listing) == len(names)
+        paged, after_id = [], None
+        while True:
+            page = (await session.exec(parts_listing_stmt(cid, limit=2, after_id=after_id))).all()
+            if not page:
+                break
+            paged += page
+            after_id = int(page[-1].id)  # clients only get to see the id and the displayed name
+        assert paged == listing
+        assert (await session.exec(parts_listing_stmt(cid, after_id=-1))).all() == []
+
+    run_in_scratch_db(check)
+
+def test_part_detail_without_triggers():
+    async def check(session: AsyncSession, cid: int) -> None:
+        part = Part(name="C1", category_id=cid, symbol_id="Device:C", footprint="Capacitor_SMD:C_0603_1608Metric",
+                    value="1u", fields={"Voltage": {"value": 16, "visible": True}})
+        session.add(part)
+        await session.flush()
+        pid = part.sequence_number
+
+        # an ORM insert must leave SQL NULL (not the JSON literal null) for part_detail to fall back on
+        assert (await session.exec(select(Part.kicad_payload.is_(None)).where(Part.sequence_number == pid))).one()
+        response = await part_detail(pid, session)
+        assert orjson.loads(response.body) == part_to_kicad_fields(part)
+        assert pid not in _PART_DETAIL_CACHE
+
+    run_in_scratch_db(check, install_triggers=False)
+
+def test_payload_backfill_repairs_json_null():
+    async def check(session: AsyncSession, cid: int) -> None:
+        part = Part(name="C1", category_id=cid, symbol_id="Device:C", footprint="Capacitor_SMD:C_0603_1608Metric",
+                    value="1u")
+        session.add(part)
+        await session.flush()
+        # what ORM inserts stored before kicad_payload used none_as_null
+        await session.exec(text("UPDATE parts SET kicad_payload = 'null'::jsonb"))
+
+        conn = await session.connection()
+        for s in (*SCHEMA_UPGRADE_SQLS, *GUARD_TOUCH_SQLS):
+            await conn.exec_driver_sql(s)
+        stmt = select(Part.kicad_payload).where(Part.sequence_number == part.sequence_number)
+        payload = (await session.exec(stmt)).one()
+        assert payload == part_to_kicad_fields(part)
+
+    run_in_scratch_db(check, install_triggers=False)
+
+def test_parts_kicad_payload_matches_python():
+    async def check(session: AsyncSession, cid: int) -> None:
+        values = test_part.model_dump(exclude={"sequence_number", "id", "kicad_payload", "updated_at", "category_id"})
+        values.update(category_id=cid, name="", fields=ODD_CUSTOM_FIELDS, exclude_from_sim=True)
+        seq = (await session.exec(insert(Part).values(**values).returning(Part.sequence_number))).scalar_one()
+
+        row = (await session.exec(select(*PART_DETAIL_COLUMNS, Part.kicad_payload).where(Part.sequence_number == seq))).one()
+        assert row.kicad_payload == part_to_kicad_fields(row)
+        assert row.kicad_payload["name"] == str(seq)
+
+    run_in_scratch_db(check)
@@ -1,6 +1,8 @@
-from src.api.v1.main import part_to_kicad_fields
+from src.api.v1._fastpath import part_to_kicad_fields, to_bool_str
+from src.api.v1.main import PART_DETAIL_COLUMNS
 from src.definitions.parts import Part
 from pprint import pprint
+from types import SimpleNamespace
 
 test_part = Part(
     id=1,
@@ -66,3 +68,67 @@ def test_part_with_custom_field3():
 
     fields=part_to_kicad_fields(p)
     assert fields["fields"]["Voltage"] == dict(value="16V", visible="False")
+
+def test_custom_field_cannot_override_fixed_field():
+    p = test_part.model_copy(update={
+        "fields": dict(Value="22uF", footprint="Capacitor_SMD:C_0603_1608Metric")
+        })
+
+    # run twice: the fixed-name check must hold on every call, not just the first
+    for _ in range(2):
+        fields = part_to_kicad_fields(p)
+        assert "Value" not in fields["fields"]
+        assert fields["fields"]["value"] == {"value": "10uF", "visible": "True"}
+        assert fields["fields"]["footprint"]["value"] == "Capacitor_SMD:C_0805_2012Metric"
+
+def test_to_bool_str():
+    for x in (True, 1, "1", "true", "TRUE", "Yes", "y"):
+        assert to_bool_str(x) == "True"
+    for x in (False, 0, "0", "false", "no", "", None):
+        assert to_bool_str(x) == "False"
+
+def test_part_to_kicad_fields_from_row():
+    # part_detail passes a column-only row rather than a Part; anything with the attributes works
+    row = SimpleNamespace(**{c.key: getattr(test_part, c.key) for c in PART_DETAIL_COLUMNS})
+    # the exclude_* columns arrive as the "True"/"False" strings produced by the case() labels
+    row.exclude_from_bom, row.exclude_from_board, row.exclude_from_sim = "True", "False", "True"
+
+    fields = part_to_kicad_fields(row)
+    assert fields["exclude_from_bom"] == "True"
+    assert fields["exclude_from_board"] == "False"
+    assert fields["exclude_from_sim"] == "True"
+    assert fields["fields"] == part_to_kicad_fields(test_part)["fields"]
+
+# Awkward custom fields and what both part_to_kicad_fields() and the parts_kicad_payload() SQL function
+# (src/db.py) must turn them into. Pinned here so the two implementations cannot drift apart silently.
+ODD_CUSTOM_FIELDS = {
+    "Flag": {"value": True, "visible": 2},
+    "Off": {"value": False, "visible": 0},
+    "Count": {"value": 16, "visible": "yes"},
+    "Ratio": {"value": 16.0, "visible": 0.5},
+    "Tiny": {"value": 1e-06, "visible": "no"},
+    "Empty": {"value": None},
+    "Pins": {"value": [1, "a"], "visible": None},
+    "Plain": "text",
+    "NoValue": {"visible": True},
+    "Number": 5,
+    "Value": "22uF",
+}
+ODD_CUSTOM_EXPECTED = {
+    "Flag": {"value": "True", "visible": "True"},
+    "Off": {"value": "False", "visible": "False"},
+    "Count": {"value": "16", "visible": "True"},
+    "Ratio": {"value": "16.0", "visible": "True"},
+    "Tiny": {"value": "0.000001", "visible": "False"},
+    "Empty": {"value": "", "visible": "False"},
+    "Pins": {"value": '[1, "a"]', "visible": "False"},
+    "Plain": {"value": "text", "visible": "False"},
+}
+
+def test_odd_custom_fields_and_empty_name():
+    p = test_part.model_copy(update={"name": "", "sequence_number": 42, "fields": ODD_CUSTOM_FIELDS})
+
+    fields = part_to_kicad_fields(p)
+    assert fields["name"] == "42"
+    custom = {k: v for k, v in fields["fields"].items() if k not in ("footprint", "datasheet", "value", "reference", "description", "keywords")}
+    assert custom == ODD_CUSTOM_EXPECTED
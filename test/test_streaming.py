@@ -0,0 +1,85 @@
+from src.api.v1.main import PartSummary, SessionStreamingResponse, json_array_chunks
+import asyncio
+
+import orjson
+
+
+def collect(batches):
+    async def gen():
+        for b in batches:
+            yield b
+
+    async def run():
+        return [chunk async for chunk in json_array_chunks(gen())]
+
+    return asyncio.run(run())
+
+def test_json_array_chunks_empty():
+    assert collect([]) == [b"[]"]
+    # the first cursor partition is empty when the category has no parts
+    assert collect([[]]) == [b"[]"]
+
+def test_json_array_chunks_single_row():
+    chunks = collect([[PartSummary("1", "R1", "")]])
+    assert chunks == [b'[{"id":"1","name":"R1","description":""}', b"]"]
+
+def test_json_array_chunks_many_batches():
+    rows = [PartSummary(str(i), f"R{i}", f"resistor {i}") for i in range(7)]
+    chunks = collect([rows[:3], rows[3:6], [], rows[6:]])
+    assert chunks[0].startswith(b"[{") and chunks[-1] == b"]"
+    # later batches continue the array with a leading comma
+    assert all(c.startswith(b",{") for c in chunks[1:-1])
+    assert orjson.loads(b"".join(chunks)) == [{"id": r.id, "name": r.name, "description": r.description} for r in rows]
+
+class FakeSession:
+    closed = False
+
+    async def close(self):
+        self.closed = True
+
+def serve(send, receive):
+    """Run a SessionStreamingResponse the way Starlette does; return the session and whether the body started."""
+    session, started = FakeSession(), []
+
+    async def body():
+        started.append(True)
+        yield b"[]"
+
+    async def run():
+        scope = {"type": "http", "asgi": {"spec_version": "2.0"}}
+        await SessionStreamingResponse(body(), session, media_type="application/json")(scope, receive, send)
+
+    try:
+        asyncio.run(run())
+    except OSError:
+        pass
+    return session, bool(started)
+
+async def never_disconnect():
+    await asyncio.sleep(3600)
+
+def test_session_closed_after_streaming():
+    sent = []
+    async def send(message):
+        sent.append(message)
+
+    session, started = serve(send, never_disconnect)
+    assert started and session.closed
+    assert sent[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
+
+def test_session_closed_when_response_start_fails():
+    async def send(message):
+        raise OSError("client went away")
+
+    session, started = serve(send, never_disconnect)
+    assert not started and session.closed
+
+def test_session_closed_when_client_disconnects_first():
+    async def send(message):
+        await asyncio.sleep(3600)  # a client that stopped reading
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    session, started = serve(send, receive)
+    assert not started and session.closed